@@ -19,6 +19,8 @@ script_path = ""
 config_path = ""
 cwd = ""
 app_data = ""
+jobs = 1
+jobserver_handle = None
 
 # Log a message to the console if not running with the --quiet flag
 def log(message):
@@ -37,6 +39,75 @@ def GetAppDataPath():
         return os.path.join(NSSearchPathForDirectoriesInDomains(14, 1, True)[0], APP_NAME)
     return os.path.expanduser(os.path.join("~", "." + APP_NAME))
 
+# Returns the value of the first -jN or --jobs=N option found in a MAKEFLAGS string, or 0 if there is none
+def GetMakeflagsJobs(makeflags):
+    match = re.search(r"(?:^|\s)(?:-j\s*|--jobs=)(\d+)", makeflags)
+    return int(match.group(1)) if match else 0
+
+# Checks whether the jobserver described by a --jobserver-auth (or older --jobserver-fds) value can actually be used
+def IsJobserverAvailable(auth):
+    if auth.startswith("fifo:"):
+        return os.path.exists(auth[5:])
+    fds = auth.split(",")
+    if len(fds) == 2 and fds[0].isdigit() and fds[1].isdigit():
+        try:
+            os.fstat(int(fds[0]))
+            os.fstat(int(fds[1]))
+            return True
+        except OSError:
+            return False
+    if sys.platform == 'win32':
+        import ctypes
+        # SYNCHRONIZE | SEMAPHORE_MODIFY_STATE
+        handle = ctypes.windll.kernel32.OpenSemaphoreW(0x00100000 | 0x0002, False, auth)
+        if handle:
+            ctypes.windll.kernel32.CloseHandle(handle)
+            return True
+    return False
+
+# Sets up a GNU make compatible jobserver shared by all task steps, dependency builds and nested Soupbuild runs.
+# An existing jobserver is inherited from MAKEFLAGS if there is one, otherwise a new one is created with the given
+# number of job slots (or -jN from MAKEFLAGS, or the CPU count). Returns the total number of job slots.
+def SetupJobserver(requested_jobs=0):
+    global jobserver_handle
+    makeflags = os.environ.get("MAKEFLAGS", "")
+    match = re.search(r"--jobserver-(?:auth|fds)=(\S+)", makeflags)
+    if match:
+        if IsJobserverAvailable(match.group(1)):
+            inherited_jobs = GetMakeflagsJobs(makeflags)
+            if requested_jobs:
+                log("Warning: Ignoring --jobs option as a jobserver was inherited from the parent process.")
+            log("Using inherited jobserver \"" + match.group(1) + "\"" + (" with " + str(inherited_jobs) + " job slots." if inherited_jobs else "."))
+            # Make doesn't always pass on the total, in which case don't assume more than one slot is ours
+            return inherited_jobs if inherited_jobs else 1
+        log("Warning: Jobserver \"" + match.group(1) + "\" from MAKEFLAGS is not accessible, creating a new jobserver.")
+
+    total_jobs = requested_jobs or GetMakeflagsJobs(makeflags) or os.cpu_count() or 1
+    # Strip any stale jobserver and job count options; these are replaced by the new jobserver
+    makeflags = re.sub(r"(?:^|\s)(?:-j\s*\d*|--jobs=\d+|--jobserver-(?:auth|fds)=\S+)(?=\s|$)", "", makeflags).strip()
+    if total_jobs <= 1:
+        os.environ["MAKEFLAGS"] = (makeflags + " -j1").strip()
+        return 1
+
+    # Soupbuild itself holds an implicit job slot, so the jobserver only hands out the rest as tokens
+    if sys.platform == 'win32':
+        import ctypes
+        auth = "gmake_semaphore_soupbuild_" + str(os.getpid())
+        jobserver_handle = ctypes.windll.kernel32.CreateSemaphoreW(None, total_jobs - 1, total_jobs - 1, auth)
+        if not jobserver_handle:
+            log("Warning: Failed to create jobserver semaphore, job slots will not be shared with subprocesses.")
+            return total_jobs
+    else:
+        read_fd, write_fd = os.pipe()
+        os.set_inheritable(read_fd, True)
+        os.set_inheritable(write_fd, True)
+        os.write(write_fd, b"+" * (total_jobs - 1))
+        jobserver_handle = (read_fd, write_fd)
+        auth = str(read_fd) + "," + str(write_fd)
+    os.environ["MAKEFLAGS"] = (makeflags + " -j" + str(total_jobs) + " --jobserver-auth=" + auth).strip()
+    log("Created jobserver \"" + auth + "\" with " + str(total_jobs) + " job slots.")
+    return total_jobs
+
 # Applies task level formatting to strings
 def format_vars(data, config, mode, platform, root):
     data = data.replace("{name}", config["name"])
@@ -47,6 +118,7 @@ def format_vars(data, config, mode, platform, root):
     data = data.replace("{work}", config["work"])
     data = data.replace("{app_data}", app_data)
     data = data.replace("{cpu_count}", str(os.cpu_count()))
+    data = data.replace("{jobs}", str(jobs))
     return data
 
 # Format the build configuration data with task level formatting
@@ -234,6 +306,7 @@ if __name__ == "__main__":
     skip_steps = "--skip-steps" in sys.argv
     
     config = None
+    requested_jobs = 0
     
     while (argi < argc and sys.argv[argi].startswith("--")):
         if (sys.argv[argi].startswith("--build-config=")):
@@ -242,6 +315,12 @@ if __name__ == "__main__":
                 config = json.loads(data.read())
                 config_path = os.path.abspath(file)
                 cwd = os.path.dirname(config_path)
+        elif (sys.argv[argi].startswith("--jobs=")):
+            try:
+                requested_jobs = int(sys.argv[argi][7:])
+            except ValueError:
+                print("ERROR: Invalid number of jobs \"" + sys.argv[argi][7:] + "\" specified.")
+                sys.exit(-1)
         argi += 1
     
     # Show program version
@@ -261,6 +340,9 @@ if __name__ == "__main__":
     # Import python3 libraries
     import urllib.request
     
+    # Share a single pool of job slots with every step, dependency build and nested Soupbuild run
+    jobs = SetupJobserver(requested_jobs)
+    
     # Find and load the build configuration file
     if (config == None):
         for file in os.listdir("."):